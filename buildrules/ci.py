@@ -2,13 +2,16 @@
 """SpackBuilder is a builder that builds using spack.
 """
 import os
-import logging
-import tempfile
+from shutil import rmtree
+from itertools import chain
+
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
 
 from buildrules.common.builder import Builder
-from buildrules.common.rule import PythonRule, SubprocessRule, LoggingRule, RuleError
-from buildrules.common.utils import makedirs, copy_file, copy_dir, write_template, write_yaml
-from shutil import rmtree
+from buildrules.common.rule import PythonRule, LoggingRule, ParallelRule
+from buildrules.common.utils import (makedirs_many, copy_file_if_changed, copy_dir,
+                                     write_file_if_changed, get_formatted_yaml,
+                                     generate_ssh_key, generate_self_signed_cert)
 
 class CIBuilder(Builder):
 
@@ -21,7 +24,7 @@ class CIBuilder(Builder):
         'title': 'CI environment schema',
         'type': 'object',
         'additionalProperties': False,
-        'patternProperties': {
+        'properties': {
             'science_build_rules_repository': {'type': 'string'},
             'science_build_configs_repository': {'type': 'string'},
             'build_folder': {'type': 'string'},
@@ -275,7 +278,9 @@ class CIBuilder(Builder):
     def __init__(self, conf_folder):
 
         super().__init__(conf_folder)
-        self._build_folder = self._confreader['build_config'].get(
+        build_config = self._confreader['build_config']
+        self._build_config = build_config
+        self._build_folder = build_config.get(
             'build_folder',
             os.path.join(os.getcwd(), 'ci'))
         self._conf_folder = os.path.join(
@@ -286,15 +291,23 @@ class CIBuilder(Builder):
             'buildrules',
             'ci',
             'templates')
+        self._jinja_env = Environment(
+            loader=FileSystemLoader(self._templates_folder),
+            bytecode_cache=FileSystemBytecodeCache(),
+            auto_reload=False)
         nfs_folder = os.path.join(
             self._build_folder,
             'nfs')
 
+        self._auths = build_config.get('auths', {})
+        self._target_workers = build_config['target_workers']
+        self._workers = [{'name':'master', 'builds': {}}] + self._target_workers
+
         self._enabled_builders = []
-        for builder_name, builder_opts in self._confreader['build_config']['builds'].items():
+        for builder_name, builder_opts in build_config['builds'].items():
             if builder_opts.get('enabled', False):
                 self._enabled_builders.append(builder_name)
-        mountpoints = self._confreader['build_config'].get('mountpoints', {})
+        mountpoints = build_config.get('mountpoints', {})
         # Set root mountpoints
         self._mountpoints = {}
         for key in ('home', 'cache', 'builds', 'software'):
@@ -313,14 +326,22 @@ class CIBuilder(Builder):
         self._mountpoints['db'] = db_paths
 
         # Normalize paths
+        build_folder = os.path.abspath(self._build_folder)
         for key in self._mountpoints:
             path = self._mountpoints[key]['path']
             if not os.path.isabs(path):
-                self._mountpoints[key]['path'] = os.path.abspath(
-                    os.path.join(self._build_folder, path))
+                self._mountpoints[key]['path'] = os.path.normpath(
+                    os.path.join(build_folder, path))
+
+        build_config['mountpoints'] = self._mountpoints
+        self._logger.debug('Mountpoints: %s', self._mountpoints)
 
-        self._confreader['build_config']['mountpoints'] = self._mountpoints
-        self._logger.warning(self._mountpoints)
+        # Home folders of all workers, keyed by worker name
+        home_path = self._mountpoints['home']['path']
+        self._worker_homes = {
+            worker['name']: os.path.join(home_path, worker['name'])
+            for worker in self._workers
+        }
 
     def _get_copy_ci_directory_rule(self):
         """Copies the template ci directory to build destination"""
@@ -340,176 +361,105 @@ class CIBuilder(Builder):
             ]
         return []
 
-    def _template_config(self, src, dest):
-        write_template(src, self._confreader['build_config'], dest)
+    def _template_config(self, config_path, template_name):
+        """Fills a template from the templates folder with the build
+        configuration and writes it to config_path if it has changed."""
+        template = self._jinja_env.get_template(template_name)
+        write_file_if_changed(
+            config_path,
+            template.render(self._build_config).strip())
+
+    def _template_configs(self, config_templates):
+        """Writes multiple configuration files from templates.
+
+        Args:
+            config_templates (list): List of (config_path, template_name)-tuples.
+        """
+        for config_path, template_name in config_templates:
+            self._template_config(config_path, template_name)
 
     def _get_config_creation_rules(self):
+        config_templates = [
+            (os.path.join(self._conf_folder, 'buildbot', 'buildbot_master.cfg'),
+             'buildbot_master.cfg.j2'),
+            (os.path.join(self._build_folder, 'docker-compose.yml'),
+             'docker-compose.yml.j2'),
+            (os.path.join(self._conf_folder, 'nginx', 'nginx.conf'),
+             'nginx.conf.j2'),
+            (os.path.join(self._conf_folder, 'nfs', 'exports.txt'),
+             'exports.txt.j2'),
+        ]
         return [
-            LoggingRule('Creating buildbot_master.cfg'),
-            PythonRule(
-                self._template_config,
-                args=[
-                    os.path.join(
-                        self._conf_folder,
-                        'buildbot',
-                        'buildbot_master.cfg'
-                    ),
-                    os.path.join(
-                        self._templates_folder,
-                        'buildbot_master.cfg.j2'
-                    ),
-                ],
-            ),
-            LoggingRule('Creating docker-compose.yml'),
-            PythonRule(
-                self._template_config,
-                args=[
-                    os.path.join(
-                        self._build_folder,
-                        'docker-compose.yml'
-                    ),
-                    os.path.join(
-                        self._templates_folder,
-                        'docker-compose.yml.j2'
-                    ),
-                ],
-            ),
-            LoggingRule('Creating nginx.conf'),
-            PythonRule(
-                self._template_config,
-                args=[
-                    os.path.join(
-                        self._conf_folder,
-                        'nginx',
-                        'nginx.conf'
-                    ),
-                    os.path.join(
-                        self._templates_folder,
-                        'nginx.conf.j2'
-                    ),
-                ],
-            ),
-            LoggingRule('Creating exports.txt'),
-            PythonRule(
-                self._template_config,
-                args=[
-                    os.path.join(
-                        self._conf_folder,
-                        'nfs',
-                        'exports.txt'
-                    ),
-                    os.path.join(
-                        self._templates_folder,
-                        'exports.txt.j2'
-                    ),
-                ],
-            ),
+            LoggingRule('Creating buildbot_master.cfg, docker-compose.yml, '
+                        'nginx.conf and exports.txt'),
+            ParallelRule([
+                PythonRule(
+                    self._template_config,
+                    args=[config_path, template_name],
+                )
+                for config_path, template_name in config_templates
+            ]),
         ]
 
+    @staticmethod
+    def _write_yamls(filenames, contents):
+        """Writes the same contents to multiple YAML files. The contents
+        are serialized only once.
+
+        Args:
+            filenames (list): Files to write.
+            contents (object): Contents to write as YAML.
+        """
+        formatted_yaml = get_formatted_yaml(contents)
+        for filename in filenames:
+            write_file_if_changed(filename, formatted_yaml)
+
     def _get_directory_creation_rules(self):
         """Creates directories for nfs"""
 
-        rules = [
-            LoggingRule('Creating home directory'),
-            PythonRule(
-                makedirs,
-                args=[self._mountpoints['home']['path']],
-                kwargs={'chmod':0o700}),
-            LoggingRule('Creating cache directory'),
-            PythonRule(
-                makedirs,
-                args=[self._mountpoints['cache']['path']],
-                kwargs={'chmod':0o700}),
-            LoggingRule('Creating db directory'),
-            PythonRule(
-                makedirs,
-                args=[self._mountpoints['db']['path']],
-                kwargs={'chmod':0o700})
+        home_path = self._mountpoints['home']['path']
+        cache_path = self._mountpoints['cache']['path']
+        builds_path = self._mountpoints['builds']['path']
+        software_path = self._mountpoints['software']['path']
+
+        folders = [
+            (home_path, 0o700),
+            (cache_path, 0o700),
+            (self._mountpoints['db']['path'], 0o700),
         ]
         for builder_name in self._enabled_builders:
-            rules.append(
-                PythonRule(
-                    makedirs,
-                    args=[os.path.join(self._mountpoints['cache']['path'], builder_name)],
-                    kwargs={'chmod':0o700}))
-
-        master = [{'name':'master'}]
-
-        workers = self._confreader['build_config']['target_workers']
-
-        def _get_home_creation_rules(workers):
-
-            worker_home_folder = os.path.join(
-                self._mountpoints['home']['path'],
-                worker['name'])
-            worker_ssh_folder = os.path.join(
-                worker_home_folder,
-                '.ssh')
-            home_creation_rules = [
-                LoggingRule(
-                    ('Creating nfs home directory '
-                     'for worker %s') % worker['name']
-                ),
-                PythonRule(
-                    makedirs,
-                    args=[worker_ssh_folder],
-                    kwargs={'chmod':0o700}),
-                LoggingRule('Creating .bashrc'),
-                PythonRule(
-                    self._template_config,
-                    args=[
-                        os.path.join(
-                            worker_home_folder,
-                            '.bashrc'
-                        ),
-                        os.path.join(
-                            self._templates_folder,
-                            'bashrc.j2'
-                        ),
-                    ]
-                ),
-            ]
-            return home_creation_rules
+            folders.append((os.path.join(cache_path, builder_name), 0o700))
 
-        for worker in master + workers:
-            rules.extend(_get_home_creation_rules(worker))
+        bashrc_templates = []
+        for worker in self._workers:
+            worker_home_folder = self._worker_homes[worker['name']]
+            folders.append((os.path.join(worker_home_folder, '.ssh'), 0o700))
+            bashrc_templates.append(
+                (os.path.join(worker_home_folder, '.bashrc'), 'bashrc.j2'))
 
-        for worker in workers:
+        for worker in self._target_workers:
             worker_name = worker['name']
-            rules.append(
-                LoggingRule(
-                    ('Creating build and software '
-                     'directories for worker %s') % worker_name))
+            worker_builds_folder = os.path.join(builds_path, worker_name)
+            worker_software_folder = os.path.join(software_path, worker_name)
             for builder_name in self._enabled_builders:
-                rules.extend([
-                    PythonRule(
-                        makedirs,
-                        args=[
-                            os.path.join(
-                                self._mountpoints['builds']['path'],
-                                worker_name,
-                                builder_name
-                            ),
-                        ],
-                    ),
-                    PythonRule(
-                        makedirs,
-                        args=[
-                            os.path.join(
-                                self._mountpoints['software']['path'],
-                                worker_name,
-                                builder_name
-                            ),
-                        ],
-                    ),
+                folders.extend([
+                    (os.path.join(worker_builds_folder, builder_name), None),
+                    (os.path.join(worker_software_folder, builder_name), None),
                 ])
-        return rules
+
+        return [
+            LoggingRule('Creating home, cache, db, build and software directories'),
+            PythonRule(makedirs_many, args=[folders]),
+            LoggingRule('Creating .bashrc files'),
+            PythonRule(self._template_configs, args=[bashrc_templates]),
+        ]
 
     def _copy_certs(self):
 
-        fqdn = self._confreader['build_config']['fqdn']
-        private_key = self._confreader['build_config']['buildbot_master'].get('private_key', None)
-        public_cert = self._confreader['build_config']['buildbot_master'].get('public_cert', None)
+        buildbot_master = self._build_config['buildbot_master']
+        fqdn = self._build_config['fqdn']
+        private_key = buildbot_master.get('private_key', None)
+        public_cert = buildbot_master.get('public_cert', None)
         key = os.path.join(self._build_folder, 'certs', 'buildbot.key')
         cert = os.path.join(self._build_folder, 'certs', 'buildbot.crt')
 
@@ -520,16 +470,16 @@ class CIBuilder(Builder):
             rules.extend([
                 LoggingRule('Copying certs'),
                 PythonRule(
-                    copy_file,
+                    copy_file_if_changed,
                     args=[
-                        self._confreader['build_config']['buildbot_master']['private_key'],
+                        private_key,
                         key
                     ]
                 ),
                 PythonRule(
-                    copy_file,
+                    copy_file_if_changed,
                     args=[
-                        self._confreader['build_config']['buildbot_master']['public_cert'],
+                        public_cert,
                         cert
                     ]
                 )
@@ -537,35 +487,33 @@ class CIBuilder(Builder):
         else:
             rules.extend([
                 LoggingRule('Creating self signed certs', self._logger.warning),
-                SubprocessRule(
-                    ['openssl', 'req', '-x509', '-nodes', '-new',
-                     '-keyout', key, '-out', cert,
-                     '-days', '365', '-subj', '/CN=%s' % fqdn],
-                    stderr_writer=self._logger.warning
-                    )
+                PythonRule(
+                    generate_self_signed_cert,
+                    args=[key, cert, fqdn]
+                )
             ])
 
         rules.extend([
             LoggingRule('Setting cert modes'),
-            PythonRule(os.chmod,
-                       args=[key, 0o600]),
-            PythonRule(os.chmod,
-                       args=[cert, 0o644])
+            PythonRule(self._set_cert_modes,
+                       args=[key, cert]),
         ])
 
-
         return rules
 
+    @staticmethod
+    def _set_cert_modes(key, cert):
+        """Makes the private key readable only by the owner and the
+        certificate readable by everyone."""
+        os.chmod(key, 0o600)
+        os.chmod(cert, 0o644)
+
     def _copy_ssh(self):
         """Copies or creates ssh keys based on configuration"""
 
         rules = []
 
-        workers = [{'name':'master', 'builds': {}}]
-
-        workers.extend(self._confreader['build_config']['target_workers'])
-
-        auth_ssh_conf = self._confreader['build_config'].get('auths', {}).get('ssh', {})
+        auth_ssh_conf = self._auths.get('ssh', {})
 
         ssh_config_src = auth_ssh_conf.get('config_file', None)
         known_hosts_src = auth_ssh_conf.get('known_hosts_file', None)
@@ -573,39 +521,34 @@ class CIBuilder(Builder):
         private_keys = auth_ssh_conf.get('private_keys', [])
         public_keys = auth_ssh_conf.get('public_keys', [])
 
-        for worker in workers:
+        # Copies do not depend on each other, so they are collected for all
+        # workers and run in parallel after any keys have been generated
+        copy_rules = []
+
+        for worker in self._workers:
 
-            ssh_folder = os.path.join(
-                self._mountpoints['home']['path'],
-                worker['name'],
-                '.ssh')
+            ssh_folder = os.path.join(self._worker_homes[worker['name']], '.ssh')
 
-            rules.append(LoggingRule(
-                ('Copying ssh settings '
-                 'to home folder of %s') % worker['name']
-            ))
             if ssh_config_src:
                 ssh_config_target = os.path.join(ssh_folder, 'config')
-                rules.extend([
+                copy_rules.append(
                     PythonRule(
-                        copy_file,
+                        copy_file_if_changed,
                         args=[
                             ssh_config_src,
                             ssh_config_target
                         ],
-                        kwargs={'chmod':0o644})
-                ])
+                        kwargs={'chmod':0o644}))
             if known_hosts_src:
                 known_hosts_target = os.path.join(ssh_folder, 'known_hosts')
-                rules.extend([
+                copy_rules.append(
                     PythonRule(
-                        copy_file,
+                        copy_file_if_changed,
                         args=[
                             known_hosts_src,
                             known_hosts_target
                         ],
-                        kwargs={'chmod':0o600})
-                ])
+                        kwargs={'chmod':0o600}))
 
             if public_keys:
                 for public_key_src in public_keys:
@@ -613,15 +556,14 @@ class CIBuilder(Builder):
                         ssh_folder,
                         os.path.basename(public_key_src)
                     )
-                    rules.extend([
+                    copy_rules.append(
                         PythonRule(
-                            copy_file,
+                            copy_file_if_changed,
                             args=[
                                 public_key_src,
                                 public_key_target
                             ],
-                            kwargs={'chmod':0o644})
-                    ])
+                            kwargs={'chmod':0o644}))
 
             if private_keys:
                 for private_key_src in private_keys:
@@ -629,15 +571,14 @@ class CIBuilder(Builder):
                         ssh_folder,
                         os.path.basename(private_key_src)
                     )
-                    rules.extend([
+                    copy_rules.append(
                         PythonRule(
-                            copy_file,
+                            copy_file_if_changed,
                             args=[
                                 private_key_src,
                                 private_key_target
                             ],
-                            kwargs={'chmod':0o600})
-                    ])
+                            kwargs={'chmod':0o600}))
             else:
                 private_key_target = os.path.join(
                     ssh_folder,
@@ -656,10 +597,9 @@ class CIBuilder(Builder):
                     rules.extend([
                         LoggingRule('No private keys given, generating them.',
                                     stdout_writer=self._logger.warning),
-                        SubprocessRule(
-                            ['ssh-keygen', '-t', 'rsa', '-b', '4096', '-N', '""',
-                             '-q', '-f', private_key_target],
-                            shell=True
+                        PythonRule(
+                            generate_ssh_key,
+                            args=[private_key_target]
                         )
                     ])
 
@@ -668,59 +608,44 @@ class CIBuilder(Builder):
                     private_keys.append(private_key_target)
                     public_keys.append('%s.pub' % private_key_target)
 
+        if copy_rules:
+            rules.extend([
+                LoggingRule('Copying ssh settings to home folders of %s' %
+                            ', '.join(self._worker_homes)),
+                ParallelRule(copy_rules),
+            ])
+
         return rules
 
     def _create_singularity_auths(self):
 
         """Creates authentications for docker registries for Singularity builder"""
 
-        rules = []
-
-        workers = [{'name':'master', 'builds': {}}]
-
-        workers.extend(self._confreader['build_config']['target_workers'])
-
         singularity_auths = {
-            'auths': self._confreader['build_config'].get('auths', {}).get('singularity', {})
+            'auths': self._auths.get('singularity', {})
         }
 
-        for worker in workers:
-
-            singularity_auths_file = os.path.join(
-                self._mountpoints['home']['path'],
-                worker['name'],
-                'singularity_auths.yaml')
+        yaml_files = [
+            os.path.join(worker_home, 'singularity_auths.yaml')
+            for worker_home in self._worker_homes.values()
+        ]
 
-            rules.append(PythonRule(
-                write_yaml, [singularity_auths_file, singularity_auths]))
-
-        return rules
+        return [PythonRule(self._write_yamls, args=[yaml_files, singularity_auths])]
 
     def _create_swift_auths(self):
 
         """Creates authentications for OpenStack deployer"""
 
-        rules = []
-
-        workers = [{'name':'master', 'builds': {}}]
-
-        workers.extend(self._confreader['build_config']['target_workers'])
-
         swift_auths = {
-            'auths': self._confreader['build_config'].get('auths', {}).get('swift', {})
+            'auths': self._auths.get('swift', {})
         }
 
-        for worker in workers:
-
-            swift_auths_file = os.path.join(
-                self._mountpoints['home']['path'],
-                worker['name'],
-                'os_auths.yaml')
-
-            rules.append(PythonRule(
-                write_yaml, [swift_auths_file, swift_auths]))
+        yaml_files = [
+            os.path.join(worker_home, 'os_auths.yaml')
+            for worker_home in self._worker_homes.values()
+        ]
 
-        return rules
+        return [PythonRule(self._write_yamls, args=[yaml_files, swift_auths])]
 
     def _get_clean_build_directory_rules(self):
         """Cleans the build directory from unnecessary files after building"""
@@ -737,16 +662,21 @@ class CIBuilder(Builder):
         ]
 
     def _get_rules(self):
-        rules = []
-        rules.extend(self._get_copy_ci_directory_rule())
-        rules.extend(self._get_directory_creation_rules())
-        rules.extend(self._copy_certs())
-        rules.extend(self._copy_ssh())
-        rules.extend(self._create_singularity_auths())
-        rules.extend(self._create_swift_auths())
-        rules.extend(self._get_config_creation_rules())
-        rules.extend(self._get_clean_build_directory_rules())
-        return rules
+        """Returns rules of all steps that are not listed in skip_rules.
+        Rules of skipped steps are not created at all."""
+        steps = [
+            ('copy_ci_directory', self._get_copy_ci_directory_rule),
+            ('create_directories', self._get_directory_creation_rules),
+            ('copy_certs', self._copy_certs),
+            ('copy_ssh', self._copy_ssh),
+            ('create_singularity_auths', self._create_singularity_auths),
+            ('create_swift_auths', self._create_swift_auths),
+            ('create_configs', self._get_config_creation_rules),
+            ('clean_build_directory', self._get_clean_build_directory_rules),
+        ]
+        return list(chain.from_iterable(
+            get_step_rules() for step, get_step_rules in steps
+            if not self._skip_rule(step)))
 
 if __name__ == "__main__":
     import sys
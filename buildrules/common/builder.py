@@ -8,6 +8,7 @@ import os
 import sys
 import logging
 import json
+from itertools import chain
 
 from buildrules.common.errors import log_error_and_quit
 from buildrules.common.confreader import ConfReader
@@ -42,29 +43,51 @@ class Builder:
     @log_error_and_quit
     def __init__(self, conf_folder):
         self._logger = logging.getLogger(self.__class__.__name__)
-        self._conf_files = list(
-            map(lambda x: os.path.join(conf_folder,x), self.CONF_FILES + ['deployment_config.yaml'])
-        )
+        self._conf_files = [os.path.join(conf_folder, conf_file)
+                            for conf_file in self.CONF_FILES + ['deployment_config.yaml']]
         self._schemas = self.SCHEMAS + [DEPLOYMENTCONFIG_SCHEMA]
         self._confreader = ConfReader(self._conf_files, self._schemas)
         self._deployers = deployer_factory(self._confreader)
+        self._build_rules = None
+        self._deployer_rules = None
 
     def _skip_rule(self, step):
         return step in self._confreader.get('build_config',{}).get('skip_rules',[])
 
+    def _get_build_rules(self):
+        """Returns the rules created by _get_rules. The rules are kept
+        until the next __call__, so describe and the following run use
+        the same rules."""
+        if self._build_rules is None:
+            self._build_rules = self._get_rules()
+        return self._build_rules
+
+    def _get_deployer_rules(self):
+        """Returns the rules of all deployers. The rules are kept until
+        the next __call__, so describe and the following run use the same
+        rules."""
+        if self._deployer_rules is None:
+            deployer_rules = []
+            for deployer in self._deployers:
+                deployer_rules.extend(deployer.get_rules())
+            self._deployer_rules = deployer_rules
+        return self._deployer_rules
+
     def __call__(self, dry_run=False):
         """This function will execute all _build_rules."""
-        rules = self._get_rules()
-
-        for deployer in self._deployers:
-            rules = rules + deployer.get_rules()
-
-        for rule in rules:
-            try:
-                rule(dry_run=dry_run)
-            except RuleError as e:
-                self._logger.error('Encountered an error while executing BuildRule: {0}: {1}'.format(rule, e))
-                sys.exit(1)
+        rules = chain(self._get_build_rules(), self._get_deployer_rules())
+
+        try:
+            for rule in rules:
+                try:
+                    rule(dry_run=dry_run)
+                except RuleError as e:
+                    self._logger.error('Encountered an error while executing BuildRule: {0}: {1}'.format(rule, e))
+                    sys.exit(1)
+        finally:
+            # Rules depend on the state on disk, so later runs create new ones
+            self._build_rules = None
+            self._deployer_rules = None
 
     def _get_rules(self):
         """"""
@@ -76,18 +99,15 @@ class Builder:
         self._logger.info('Builder: {0}'.format(self.BUILDER_NAME))
         self._logger.info(
             'Configuration files: {0}'.format(' '.join(self.CONF_FILES + ['deployment_config.yaml'])))
-        self._logger.debug(str(self._confreader))
+        self._logger.debug('%s', self._confreader)
 
-        rules = self._get_rules()
+        rules = self._get_build_rules()
 
         self._logger.info('Build rule descriptions:')
         for rule in rules:
             self._logger.info(rule)
 
-        deployer_rules = []
-        deployers = deployer_factory(self._confreader)
-        for deployer in deployers:
-            deployer_rules = deployer_rules + deployer.get_rules()
+        deployer_rules = self._get_deployer_rules()
 
         self._logger.info('Deployment descriptions:')
         for rule in deployer_rules:
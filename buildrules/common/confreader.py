@@ -5,9 +5,97 @@ from os.path import basename, splitext
 from collections.abc import Mapping
 from textwrap import indent
 from copy import copy
-from jsonschema import validate, Draft4Validator
+from jsonschema import Draft4Validator
+from jsonschema.exceptions import best_match
+from jsonschema.validators import validator_for
 import yaml
 
+try:
+    import fastjsonschema
+except ImportError:
+    fastjsonschema = None
+
+# Use the libyaml-backed loader and dumper when PyYAML has been built against it
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+YAML_DUMPER = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+
+# Validators that have already been created, keyed by schema id
+_VALIDATORS = {}
+_FAST_VALIDATORS = {}
+
+def get_validator(schema):
+    """Returns a validator for a schema.
+
+    The schema is checked and the validator is created only once per
+    schema. Later calls return the cached validator.
+
+    Args:
+        schema (dict): Schema used for validation.
+    Returns:
+        object: jsonschema validator for the schema.
+    """
+    cached = _VALIDATORS.get(id(schema))
+    # Schema is stored alongside the validator so that its id is not reused
+    if cached is None or cached[0] is not schema:
+        validator_class = validator_for(schema)
+        validator_class.check_schema(schema)
+        cached = (schema, validator_class(schema))
+        _VALIDATORS[id(schema)] = cached
+    return cached[1]
+
+def get_fast_validator(schema):
+    """Returns a validation function generated by fastjsonschema.
+
+    The function is compiled only once per schema. Defaults and formats
+    are not applied so that the result matches jsonschema.
+
+    Args:
+        schema (dict): Schema used for validation.
+    Returns:
+        function: Validation function or None if fastjsonschema is not
+            installed, is too old to accept the options or it cannot
+            compile the schema.
+    """
+    if fastjsonschema is None:
+        return None
+    cached = _FAST_VALIDATORS.get(id(schema))
+    if cached is None or cached[0] is not schema:
+        try:
+            fast_validator = fastjsonschema.compile(
+                schema, use_default=False, use_formats=False)
+        except (fastjsonschema.JsonSchemaDefinitionException, TypeError):
+            fast_validator = None
+        cached = (schema, fast_validator)
+        _FAST_VALIDATORS[id(schema)] = cached
+    return cached[1]
+
+def validate(instance, schema):
+    """Validates that the instance matches the schema using cached
+    validators.
+
+    Args:
+        instance (object): Data to validate.
+        schema (dict): Schema used for validation.
+    Raises:
+        ValidationError: Raises ValidationError if data does not match
+            the schema.
+    """
+    validator = get_validator(schema)
+
+    # Valid instances are accepted by the generated validator.
+    # Invalid ones are re-validated with jsonschema for its error.
+    fast_validator = get_fast_validator(schema)
+    if fast_validator is not None:
+        try:
+            fast_validator(instance)
+            return
+        except fastjsonschema.JsonSchemaException:
+            pass
+
+    error = best_match(validator.iter_errors(instance))
+    if error is not None:
+        raise error
+
 class ConfReader(Mapping):
     """ConfReader is used for reading an validating configurations.
 
@@ -81,7 +169,7 @@ class ConfReader(Mapping):
             ValidationError: Raises ValidationError if data does not match
                 the schema.
         """
-        validate(instance=self[config], schema=schema)
+        validate(self[config], schema)
 
     def _read_yaml(self, yamlfile):
         """
@@ -90,14 +178,15 @@ class ConfReader(Mapping):
         """
 
         with open(yamlfile, 'r') as yaml_f:
-            configuration = yaml.load(yaml_f.read(), Loader=yaml.Loader)
+            configuration = yaml.load(yaml_f, Loader=YAML_LOADER)
 
         return configuration
 
     def __str__(self):
 
         conf_files = [config for config in self._conf_files]
-        configs = [indent(yaml.dump(self[config], default_flow_style=False), 4*' ')
+        configs = [indent(yaml.dump(self[config], Dumper=YAML_DUMPER,
+                                     default_flow_style=False), 4*' ')
                    for config in iter(self)]
 
 
@@ -9,8 +9,7 @@ import logging
 import os
 import yaml
 from buildrules.common.rule import SubprocessRule, LoggingRule, PythonRule
-from buildrules.common.confreader import ConfReader
-from jsonschema import validate
+from buildrules.common.confreader import ConfReader, validate
 from swiftclient.service import SwiftError, SwiftService, SwiftUploadObject
 
 DEPLOYMENTCONFIG_SCHEMA = {
@@ -78,7 +77,13 @@ class RsyncDeployer(Deployer):
         "working_directory": None
     }
 
-    def _get_rsync_deployment_command(self, dry_run=False):
+    def __init__(self, deployer_config):
+
+        super().__init__(deployer_config)
+
+        self._rsync_command, self._rsync_cwd = self._get_rsync_deployment_command()
+
+    def _get_rsync_deployment_command(self):
         rsync_deployer_config = self.DEFAULT_CONFIGS.copy()
         rsync_deployer_config.update(**self._deployer_config)
 
@@ -107,12 +112,12 @@ class RsyncDeployer(Deployer):
             target = '{0}:{1}'.format(target_host, target)
         src = '"{0}/"'.format(src)
 
-        return SubprocessRule(cmd + [src, target], shell=True, cwd=rsync_cwd)
+        return cmd + [src, target], rsync_cwd
 
     def get_rules(self):
         rules = []
         rules.append(LoggingRule('Deploying software with rsync deployer:'))
-        rules.append(self._get_rsync_deployment_command())
+        rules.append(SubprocessRule(self._rsync_command, shell=True, cwd=self._rsync_cwd))
         return rules
 
 
@@ -179,6 +184,42 @@ class SwiftDeployer(Deployer):
 
         return auths
 
+    def _iter_upload_objects(self, source_dir, source_replacement=None):
+        """Yields SwiftUploadObjects for all files in a directory tree.
+
+        Empty directories are uploaded as directory markers.
+
+        Args:
+            source_dir (str): Directory to upload.
+            source_replacement (str): Replacement for source_dir in the
+                object names.
+
+        Yields:
+            SwiftUploadObject: Object to upload.
+        """
+        stack = [source_dir]
+        while stack:
+            root_dir = stack.pop()
+            empty = True
+            with os.scandir(root_dir) as entries:
+                for entry in entries:
+                    empty = False
+                    if entry.is_dir():
+                        if not entry.is_symlink():
+                            stack.append(entry.path)
+                        continue
+                    name = entry.path
+                    if source_replacement:
+                        name = name.replace(source_dir, source_replacement, 1)
+                    self._logger.debug('Queuing object: %s', name)
+                    yield SwiftUploadObject(entry.path, name)
+            if empty:
+                name = root_dir
+                if source_replacement:
+                    name = name.replace(source_dir, source_replacement, 1)
+                self._logger.debug('Queuing directory marker: %s', name)
+                yield SwiftUploadObject(None, name, options={'dir_marker': True})
+
     def _swift_deploy(self):
 
         auth = self._auths[self._deployer_config['target_host']]
@@ -197,36 +238,13 @@ class SwiftDeployer(Deployer):
             container_stat = swift.stat(container)
 
             source_dir = self._deployer_config['source']
-            objects = []
-            for root_dir, subdirectories, file_list in os.walk(source_dir):
-                if not (subdirectories + file_list):
-                    objects.append({
-                        'path': None,
-                        'name': root_dir,
-                        'options': {'dir_marker': True},
-                    })
-                else:
-                    for filename in file_list:
-                        file_path = os.path.join(root_dir, filename)
-                        objects.append({
-                            'path': file_path,
-                            'name': file_path,
-                            'options': None,
-                        })
-
             source_replacement = self._deployer_config.get('source_replacement', None)
-            if source_replacement:
-                for obj in objects:
-                    obj['name'] = obj['name'].replace(source_dir, source_replacement, 1)
-
-            swift_objects = [ SwiftUploadObject(obj['path'], obj['name'], options=obj['options'])
-                for obj in objects
-            ]
-
-            self._logger.info(
-                'Uploading following objects into container %s:\n%s',
-                container, '\n'.join([obj['name'] for obj in objects]))
-            upload_results = list(swift.upload(container, swift_objects))
+
+            self._logger.info('Uploading objects into container %s', container)
+            upload_results = swift.upload(
+                container,
+                self._iter_upload_objects(source_dir, source_replacement),
+                options={'skip_identical': True})
             for upload_result in upload_results:
                 if upload_result['action'] == 'create_container':
                     self._logger.info(
@@ -234,6 +252,9 @@ class SwiftDeployer(Deployer):
                 elif upload_result['action'] == 'create_dir_marker':
                     self._logger.info(
                         'Creating directory marker: %s', upload_result['object'])
+                elif upload_result.get('status') == 'skipped-identical':
+                    self._logger.debug(
+                        'Skipping identical object: %s', upload_result['object'])
                 elif upload_result['action'] == 'upload_object':
                     self._logger.info(
                         'Uploading object: %s', upload_result['object'])
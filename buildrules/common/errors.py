@@ -1,11 +1,9 @@
 import sys
 import logging
-import traceback
-from io import StringIO
 
 def log_error_and_quit(function):
-    """log_error_and_quit is a decorator that logs errors, prints
-    stack trace and then quits.
+    """log_error_and_quit is a decorator that logs errors with their
+    traceback and then quits.
 
     Args:
         function (function): Function that will be decorated.
@@ -18,10 +16,6 @@ def log_error_and_quit(function):
         try:
             return function(*args, **kwargs)
         except Exception as error:
-            logging.error('Encountered an error:\n\n%s', error)
-            trace = StringIO()
-            traceback.print_stack(file=trace)
-            logging.error(trace.getvalue())
-            trace.close()
+            logging.exception('Encountered an error:\n\n%s', error)
             sys.exit(1)
     return exception_wrapper
@@ -10,9 +10,10 @@ returned as BuildRuleErrors.
 import os
 import logging
 import subprocess
-import select
+import threading
 import traceback
 from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
 
 class RuleError(Exception):
     """BuildRuleError is the error for build rules."""
@@ -52,6 +53,9 @@ class Rule:
         stderr_writer (function): Function to use for logging stderr from command.
     """
 
+    # Builders create many rules, so instances do not carry a __dict__
+    __slots__ = ('_logger', '_stdout_writer', '_stderr_writer')
+
     def __init__(self, stdout_writer, stderr_writer):
         self._logger = logging.getLogger(self.__class__.__name__)
         if stdout_writer is None:
@@ -85,6 +89,8 @@ class PythonRule(Rule):
         output (object): Output of the Python function call.
     """
 
+    __slots__ = ('_func', '_args', '_kwargs', '_hide_args', '_hide_kwargs')
+
     def __init__(self,
                  func,
                  args=None,
@@ -150,6 +156,9 @@ class SubprocessRule(Rule):
 
     """
 
+    __slots__ = ('_sp_command', '_orig_env', '_env', '_shell', '_check', '_cwd',
+                 '_hide_env')
+
     def __init__(self,
                  sp_command,
                  env=None,
@@ -182,49 +191,71 @@ class SubprocessRule(Rule):
             cmd = self._sp_command
 
         def logged_call():
-            def capture_io():
-                pass
-            try:
-                sp_call = subprocess.Popen(
+            with subprocess.Popen(
                     cmd,
-                    bufsize=0,
                     stdout=subprocess.PIPE,
                     stderr=subprocess.PIPE,
                     env=self._env,
                     shell=self._shell,
-                    cwd=self._cwd
-                )
-
-                loggers = {sp_call.stdout: self._stdout_writer,
-                           sp_call.stderr: self._stderr_writer}
-
-                def capture_io():
-                    output = select.select([sp_call.stdout, sp_call.stderr], [], [], 1000)[0]
-                    for io_stream in output:
-                        line = io_stream.readline()[:-1].decode('utf-8')
-                        if line:
-                            loggers[io_stream](line)
+                    cwd=self._cwd) as sp_call:
+
+                # Read both streams concurrently so neither pipe fills up
+                writer_errors = []
+                readers = [
+                    threading.Thread(
+                        target=self._log_stream,
+                        args=(sp_call.stdout, self._stdout_writer, writer_errors),
+                        daemon=True),
+                    threading.Thread(
+                        target=self._log_stream,
+                        args=(sp_call.stderr, self._stderr_writer, writer_errors),
+                        daemon=True),
+                ]
+                for reader in readers:
+                    reader.start()
 
-                # Poll subprocess call for output
-                while sp_call.poll() is None:
-                    capture_io()
-
-                capture_io()
-
-                # Raise error if check is enabled
                 return_code = sp_call.wait()
-                if self._check and return_code != 0:
-                    raise subprocess.CalledProcessError(return_code, ' '.join(cmd))
-                return return_code
+                for reader in readers:
+                    reader.join()
+
+            if writer_errors:
+                raise writer_errors[0]
 
-            finally:
-                capture_io()
+            # Raise error if check is enabled
+            if self._check and return_code != 0:
+                raise subprocess.CalledProcessError(return_code, ' '.join(cmd))
+            return return_code
 
         if not dry_run:
             return logged_call()
 
         return 0
 
+    @staticmethod
+    def _log_stream(stream, writer, writer_errors):
+        """Writes lines from a subprocess output stream until it is closed.
+
+        If writer raises an error, the error is stored and the rest of the
+        stream is read without writing it, so that the subprocess does not
+        block on a full pipe.
+
+        Args:
+            stream (file): Binary output stream of the subprocess.
+            writer (function): Function used for logging the lines.
+            writer_errors (list): List where errors raised by writer are
+                appended.
+        """
+        for line in stream:
+            if writer is None:
+                continue
+            line = line.rstrip(b'\n').decode('utf-8', errors='replace')
+            if line:
+                try:
+                    writer(line)
+                except Exception as error:
+                    writer_errors.append(error)
+                    writer = None
+
     def __str__(self):
         msg = 'SubprocessRule: {{ '
         msg_list = ['sp_function: {0}'.format(' '.join(self._sp_command))]
@@ -234,6 +265,56 @@ class SubprocessRule(Rule):
         msg += ', '.join(msg_list) + ' }}'
         return msg
 
+class ParallelRule(Rule):
+    """ParallelRule is a BuildRule that when called will execute a group of
+    independent rules concurrently in a thread pool.
+
+    Only rules that do not depend on each other should be grouped. This is
+    mostly useful for I/O bound rules such as directory creation and file
+    copies.
+
+    Args:
+        rules (list): Rules that will be executed.
+        max_workers (int, optional): Maximum number of threads to use.
+            Default is None, which uses the ThreadPoolExecutor default.
+        stdout_writer (function, optional): Function to use for logging stdout
+            from command. Default is logging.info.
+        stderr_writer (function, optional): Function to use for logging stderr
+            from command. Default is logging.warning.
+
+    Returns:
+        outputs (list): Outputs of the rules in the order they were given.
+    """
+
+    __slots__ = ('_rules', '_max_workers')
+
+    def __init__(self,
+                 rules,
+                 max_workers=None,
+                 stdout_writer=None,
+                 stderr_writer=None):
+        self._rules = rules
+        self._max_workers = max_workers
+        super().__init__(stdout_writer, stderr_writer)
+
+    @rule_error_wrapper
+    def __call__(self, dry_run=False):
+        self._logger.info('Running %s', self)
+
+        if not self._rules:
+            return []
+
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            futures = [executor.submit(rule, dry_run=dry_run) for rule in self._rules]
+
+        return [future.result() for future in futures]
+
+    def __str__(self):
+        msg = 'ParallelRule: {{ '
+        msg += 'rules: [{0}]'.format(', '.join(str(rule) for rule in self._rules))
+        msg += ' }}'
+        return msg
+
 class LoggingRule(Rule):
     """LoggingRule is a simple logger that outputs a message at desired step.
 
@@ -242,6 +323,8 @@ class LoggingRule(Rule):
         stdout_writer (function): Function to use for logging the message.
     """
 
+    __slots__ = ('_message',)
+
     def __init__(self, message, stdout_writer=None):
         self._message = message
         super().__init__(stdout_writer, None)
@@ -2,14 +2,49 @@
 """Utils contains various useful utilities for builders.
 """
 import os
+import sys
 import re
 import hashlib
 import json
 import textwrap
-from shutil import copy2, copytree
+import filecmp
+import mmap
+from functools import lru_cache
+from shutil import copy2, copystat, copytree, SameFileError
 import yaml
-from jinja2 import Template
+from jinja2 import Environment
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Use the libyaml-backed loader when PyYAML has been built against it
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# Environment shared by all templates filled with fill_template
+_JINJA_ENV = Environment()
+
+# Read buffer size for calculate_file_checksum on Python < 3.11
+CHECKSUM_BUFFER_SIZE = 1024*1024
+
+# Files at least this large are memory-mapped by calculate_file_checksum
+CHECKSUM_MMAP_THRESHOLD = 8*1024*1024
+
+# Hash functions supported by the checksum functions
+HASH_FUNCTIONS = {
+    'sha256': hashlib.sha256
+}
+
+# FICLONE ioctl request for cloning files on copy-on-write filesystems.
+# The request number is Linux-specific, so other platforms do not clone.
+if fcntl is not None and sys.platform.startswith('linux'):
+    FICLONE = getattr(fcntl, 'FICLONE', 0x40049409)
+else:
+    FICLONE = None
+
+# YAMLDumper indents lists inside mappings. libyaml's CSafeDumper emits
+# them in C and cannot be customized, so the pure Python dumper is kept.
 class YAMLDumper(yaml.SafeDumper):
 
     def increase_indent(self, flow=False, indentless=False):
@@ -31,16 +66,20 @@ def write_yaml(filename, contents):
 
 def load_yaml(filename):
     with open(filename, 'r') as yaml_file:
-        contents = yaml.load(yaml_file, Loader=yaml.SafeLoader)
+        contents = yaml.load(yaml_file, Loader=YAML_LOADER)
     return contents
 
 def makedirs(path, chmod=None):
-    """ This function creates a folder with requested permissions
+    """ This function creates a folder with requested permissions.
+    Permissions are only set if the folder is created.
 
     Args:
         path (str): Folder to create.
         chmod (str): Chmod permissions. Default is None.
     """
+    # Existing folders are the common case on re-runs
+    if os.path.isdir(path):
+        return
     try:
         os.makedirs(path)
         if chmod:
@@ -48,6 +87,20 @@ def makedirs(path, chmod=None):
     except FileExistsError:
         pass
 
+def makedirs_many(folders):
+    """ This function creates multiple folders with requested permissions.
+    Duplicate paths are created once, using the first chmod given for
+    them. Paths are created in sorted order so that parents come first.
+
+    Args:
+        folders (list): List of (path, chmod)-tuples. chmod can be None.
+    """
+    unique_folders = {}
+    for path, chmod in folders:
+        unique_folders.setdefault(os.path.normpath(path), chmod)
+    for path in sorted(unique_folders):
+        makedirs(path, chmod=unique_folders[path])
+
 def copy_file(src, target, chmod=None):
     """ This function copies a file from src to target with required
     permissions.
@@ -57,10 +110,77 @@ def copy_file(src, target, chmod=None):
         target (str): Target folder / file.
         chmod (str): Chmod permissions. Default is None.
     """
-    copy2(src, target)
+    if os.path.isdir(target):
+        target = os.path.join(target, os.path.basename(src))
+    if clone_file(src, target):
+        copystat(src, target)
+    else:
+        copy2(src, target)
     if chmod:
         os.chmod(target, chmod)
 
+def clone_file(src, target):
+    """ This function clones a file with the FICLONE ioctl. The clone
+    shares data blocks with src until either file is modified. This works
+    only on Linux filesystems that support reflinks, e.g. btrfs and xfs.
+    If cloning fails, target is left empty and has to be copied normally.
+
+    Args:
+        src (str): File that will be cloned.
+        target (str): Target file.
+    Returns:
+        bool: True if the file was cloned.
+    """
+    if FICLONE is None:
+        return False
+    if os.path.exists(target) and os.path.samefile(src, target):
+        raise SameFileError('{0} and {1} are the same file'.format(src, target))
+    with open(src, 'rb') as src_file:
+        try:
+            with open(target, 'wb') as target_file:
+                fcntl.ioctl(target_file.fileno(), FICLONE, src_file.fileno())
+        except OSError:
+            return False
+    return True
+
+def copy_file_if_changed(src, target, chmod=None):
+    """ This function copies a file from src to target with required
+    permissions if target does not already have the same contents.
+
+    Args:
+        src (str): File that will be copied.
+        target (str): Target file.
+        chmod (str): Chmod permissions. Default is None.
+    Returns:
+        bool: True if the file was copied.
+    """
+    if os.path.isfile(target) and filecmp.cmp(src, target, shallow=True):
+        if chmod:
+            os.chmod(target, chmod)
+        return False
+    copy_file(src, target, chmod=chmod)
+    return True
+
+def write_file_if_changed(target, contents):
+    """ This function writes contents to target if target does not already
+    contain them. Unchanged files keep their modification times.
+
+    Args:
+        target (str): Target file.
+        contents (str): Contents to write.
+    Returns:
+        bool: True if the file was written.
+    """
+    try:
+        with open(target, 'r') as target_file:
+            if target_file.read() == contents:
+                return False
+    except (FileNotFoundError, UnicodeDecodeError):
+        pass
+    with open(target, 'w') as target_file:
+        target_file.write(contents)
+    return True
+
 def copy_dir(src, target, chmod=None):
     """ This function copies a folder from src to target with required
     permissions.
@@ -74,6 +194,89 @@ def copy_dir(src, target, chmod=None):
     if chmod:
         os.chmod(target, chmod)
 
+def generate_ssh_key(private_key_path, key_size=4096):
+    """ This function generates an unencrypted RSA key pair in OpenSSH
+    format without calling ssh-keygen.
+
+    Args:
+        private_key_path (str): Path of the private key. The public key is
+            written to private_key_path + '.pub'.
+        key_size (int): Key size in bits. Default is 4096.
+    """
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=key_size)
+    private_bytes = key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.OpenSSH,
+        encryption_algorithm=serialization.NoEncryption())
+    public_bytes = key.public_key().public_bytes(
+        encoding=serialization.Encoding.OpenSSH,
+        format=serialization.PublicFormat.OpenSSH)
+
+    fd = os.open(private_key_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as private_key_file:
+        private_key_file.write(private_bytes)
+    with open('%s.pub' % private_key_path, 'wb') as public_key_file:
+        public_key_file.write(public_bytes + b'\n')
+
+def generate_self_signed_cert(key_path, cert_path, common_name, days=365, key_size=2048):
+    """ This function generates an unencrypted RSA key and a self-signed
+    certificate for it without calling openssl.
+
+    Args:
+        key_path (str): Path of the private key. Written in PEM format.
+        cert_path (str): Path of the certificate. Written in PEM format.
+        common_name (str): Common name (CN) of the certificate.
+        days (int): Number of days the certificate is valid. Default is 365.
+        key_size (int): Key size in bits. Default is 2048.
+    """
+    from datetime import datetime, timedelta, timezone
+    from cryptography import x509
+    from cryptography.x509.oid import NameOID
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=key_size)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, common_name)])
+    not_before = datetime.now(timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(not_before)
+        .not_valid_after(not_before + timedelta(days=days))
+        .add_extension(
+            x509.SubjectKeyIdentifier.from_public_key(key.public_key()),
+            critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+
+    fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as key_file:
+        key_file.write(key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption()))
+    with open(cert_path, 'wb') as cert_file:
+        cert_file.write(cert.public_bytes(serialization.Encoding.PEM))
+
+@lru_cache(maxsize=None)
+def _compile_template(template):
+    """Compiles a jinja2-template string. Builders fill the same
+    templates many times, so compiled templates are cached.
+
+    Args:
+        template (str): jinja2-template as a string.
+    Returns:
+        jinja2.Template: Compiled template.
+    """
+    return _JINJA_ENV.from_string(textwrap.dedent(template))
+
 def fill_template(template, config):
     """Fills a jinja2-template based on configuration dict.
 
@@ -83,7 +286,7 @@ def fill_template(template, config):
     Returns:
         str: Filled template.
     """
-    return Template(textwrap.dedent(template)).render(config).strip()
+    return _compile_template(template).render(config).strip()
 
 def write_template(target_path, config, template_path=None, template=None, chmod=None):
     """Writes a file based on jinja2-template.
@@ -99,7 +302,7 @@ def write_template(target_path, config, template_path=None, template=None, chmod
         raise ValueError('Both template_path and template cannot be empty')
     if not template:
         with open(template_path, 'r') as template_file:
-            template = ''.join(template_file.readlines())
+            template = template_file.read()
     filled_template = fill_template(template, config)
     with open(target_path, 'w') as target_file:
         target_file.write(filled_template)
@@ -107,21 +310,43 @@ def write_template(target_path, config, template_path=None, template=None, chmod
         os.chmod(target_path, chmod)
 
 def calculate_file_checksum(filename, hash_function='sha256'):
-    hash_functions = {
-        'sha256': hashlib.sha256
-    }
-    hash_function = hash_functions[hash_function]()
+    """ This function calculates the checksum of a file. Checksums are
+    cached until the file's path, size or modification time changes.
+
+    Args:
+        filename (str): File to calculate the checksum for.
+        hash_function (str): Hash function to use. Default is 'sha256'.
+    Returns:
+        str: Checksum as a hex string.
+    """
+    stat = os.stat(filename)
+    return _calculate_file_checksum(
+        os.path.abspath(filename), stat.st_mtime_ns, stat.st_size, hash_function)
+
+@lru_cache(maxsize=4096)
+def _calculate_file_checksum(filename, mtime_ns, size, hash_function):
+    # mtime_ns and size are only part of the cache key
+    hash_function = HASH_FUNCTIONS[hash_function]()
     with open(filename, "rb") as input_file:
-        for byte_block in iter(lambda: input_file.read(4096), b""):
-            hash_function.update(byte_block)
+        file_size = os.fstat(input_file.fileno()).st_size
+        if file_size >= CHECKSUM_MMAP_THRESHOLD:
+            with mmap.mmap(input_file.fileno(), file_size,
+                           access=mmap.ACCESS_READ) as mapped_file:
+                if hasattr(mapped_file, 'madvise'):
+                    mapped_file.madvise(mmap.MADV_SEQUENTIAL)
+                hash_function.update(mapped_file)
+        elif hasattr(hashlib, 'file_digest'):
+            hash_function = hashlib.file_digest(input_file, lambda: hash_function)
+        else:
+            buffer = bytearray(CHECKSUM_BUFFER_SIZE)
+            view = memoryview(buffer)
+            for nread in iter(lambda: input_file.readinto(buffer), 0):
+                hash_function.update(view[:nread])
 
     return hash_function.hexdigest()
 
 def calculate_dict_checksum(dict_object, hash_function='sha256'):
-    hash_functions = {
-        'sha256': hashlib.sha256
-    }
-    hash_function = hash_functions[hash_function]()
+    hash_function = HASH_FUNCTIONS[hash_function]()
     json_dump = json.dumps(dict_object, ensure_ascii=False, sort_keys=True)
     hash_function.update(json_dump.encode('utf-8'))
 
@@ -167,6 +167,34 @@ class TestBuilder(unittest.TestCase):
             ),
         )
 
+    @ignore_deprecationwarning
+    @log_capture(level=logging.INFO)
+    def test_builder_rules_created_once(self, capture):
+        """This function tests that describe() and the following run use
+        the same rules and that every later run creates new rules."""
+
+        class TestBuilderRulesOnce(Builder):
+
+            def __init__(self, conf_folder):
+                self.get_rules_calls = 0
+                super().__init__(conf_folder)
+
+            def _get_rules(self):
+                self.get_rules_calls += 1
+                return [
+                    PythonRule(
+                        example_function,
+                        [0, 0],
+                        {}),
+                    ]
+
+        builder_instance = TestBuilderRulesOnce(os.path.join('tests', 'builder_test'))
+        builder_instance.describe()
+        builder_instance()
+        self.assertEqual(builder_instance.get_rules_calls, 1)
+        builder_instance(dry_run=True)
+        self.assertEqual(builder_instance.get_rules_calls, 2)
+
     @ignore_deprecationwarning
     @log_capture(level=logging.INFO)
     def test_builder_additional_conf_file_empty_schema(self, capture):
@@ -0,0 +1,74 @@
+# -*- coding=utf-8 -*-
+"""These tests test various features of the buildrules.ci-module."""
+
+import os
+import tempfile
+import unittest
+import yaml
+
+from buildrules.ci import CIBuilder
+
+BUILD_CONFIG = {
+    'fqdn': 'ci.example.org',
+    'science_build_rules_repository': 'https://example.org/rules.git',
+    'science_build_configs_repository': 'https://example.org/configs.git',
+    'compose_project_name': 'ci',
+    'buildbot_master': {
+        'image': 'master',
+        'worker_password': 'pw',
+        'worker_uid': 1000,
+    },
+    'buildbot_db': {
+        'postgres_password': 'pw',
+    },
+    'auths': {
+        'singularity': {
+            'docker.io': {
+                'username': 'u',
+                'password': 'p',
+            },
+        },
+    },
+    'builds': {
+        'spack': {'enabled': True},
+    },
+    'target_workers': [
+        {'name': 'w1', 'image': 'img1'},
+    ],
+}
+
+class TestCIBuilder(unittest.TestCase):
+    """This class tests various features of the buildrules.ci-module."""
+
+    def get_rule_descriptions(self, skip_rules):
+        """Returns descriptions of the rules of a CIBuilder that skips the
+        given steps."""
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            build_config = dict(BUILD_CONFIG,
+                                build_folder=os.path.join(tmpdir, 'build'),
+                                skip_rules=skip_rules)
+            with open(os.path.join(tmpdir, 'build_config.yaml'), 'w') as config_file:
+                yaml.dump(build_config, config_file)
+            with open(os.path.join(tmpdir, 'deployment_config.yaml'), 'w') as config_file:
+                yaml.dump([], config_file)
+
+            return [str(rule) for rule in CIBuilder(tmpdir)._get_rules()]
+
+    def test_ci_builder_skip_rules(self):
+        """This function tests that rules of steps listed in skip_rules
+        are left out."""
+
+        all_rules = self.get_rule_descriptions([])
+        self.assertTrue(any('Copying ssh settings' in rule for rule in all_rules))
+        self.assertTrue(any('Cleaning build directory' in rule for rule in all_rules))
+
+        skipped_rules = self.get_rule_descriptions(['copy_ssh', 'clean_build_directory'])
+        self.assertFalse(any('Copying ssh settings' in rule for rule in skipped_rules))
+        self.assertFalse(any('Cleaning build directory' in rule for rule in skipped_rules))
+        self.assertTrue(any('Setting cert modes' in rule for rule in skipped_rules))
+        self.assertLess(len(skipped_rules), len(all_rules))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,9 +4,10 @@
 import os
 import copy
 import unittest
-from jsonschema.exceptions import ValidationError
+from jsonschema.exceptions import ValidationError, SchemaError
 
-from buildrules.common.confreader import ConfReader
+from buildrules.common.confreader import (ConfReader, get_validator, get_fast_validator,
+                                          validate)
 from .common import EXAMPLE_CONFIGS, EXAMPLE_SCHEMAS
 
 class TestConfReader(unittest.TestCase):
@@ -219,6 +220,62 @@ class TestConfReader(unittest.TestCase):
             )
             print(cr_invalid)
 
+    def test_conf_reader_validator_reused(self):
+        """This function tests that the validator for a schema is
+        created only once and reused for later validations."""
+
+        deployment_config = EXAMPLE_CONFIGS['deployment_config']
+        deployment_config_schema = copy.deepcopy(EXAMPLE_SCHEMAS['deployment_config'])
+
+        validator = get_validator(deployment_config_schema)
+        self.assertIs(get_validator(deployment_config_schema), validator)
+        self.assertIsNot(get_validator(copy.deepcopy(deployment_config_schema)), validator)
+
+        cr_valid = ConfReader(
+            [deployment_config],
+            [deployment_config_schema]
+        )
+        self.assertIs(get_validator(deployment_config_schema), validator)
+        self.assertEqual(cr_valid['deployment_config']['method'], 'rsync')
+
+    def test_conf_reader_fast_validator(self):
+        """This function tests that the fastjsonschema validator is
+        compiled once per schema and does not insert defaults."""
+
+        schema = {
+            "type": "object",
+            "properties": {
+                "method": {"type": "string"},
+                "options": {"type": "object", "default": {}},
+            },
+        }
+        fast_validator = get_fast_validator(schema)
+        if fast_validator is None:
+            self.skipTest('fastjsonschema is not installed')
+        self.assertIs(get_fast_validator(schema), fast_validator)
+
+        config = {"method": "rsync"}
+        fast_validator(config)
+        self.assertEqual(config, {"method": "rsync"})
+
+    def test_conf_reader_invalid_schema(self):
+        """This function tests behaviour of ConfReader when
+        the schema itself is invalid."""
+
+        with self.assertRaises(SchemaError):
+            ConfReader(
+                [EXAMPLE_CONFIGS['deployment_config']],
+                [{"type": "objekt"}]
+            )
+
+    def test_validate(self):
+        """This function tests the module-level validate function."""
+
+        schema = {"type": "object", "required": ["method"]}
+        validate({"method": "rsync"}, schema)
+        with self.assertRaises(ValidationError):
+            validate({"target_host": "host"}, schema)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,48 @@
+# -*- coding=utf-8 -*-
+"""These tests test various features of the buildrules.common.deployer-module."""
+
+import os
+import tempfile
+import unittest
+
+from buildrules.common.deployer import SwiftDeployer
+
+class TestDeployer(unittest.TestCase):
+    """This class tests various features of the buildrules.common.deployer-module."""
+
+    def test_swift_deployer_upload_objects(self):
+        """This function tests that SwiftDeployer uploads files of nested
+        directories and marks empty directories, with names mapped by
+        source_replacement."""
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            source_dir = os.path.join(tmpdir, 'software')
+            os.makedirs(os.path.join(source_dir, 'a', 'b'))
+            os.makedirs(os.path.join(source_dir, 'empty'))
+            for filename in [['top'], ['a', 'f1'], ['a', 'b', 'f2']]:
+                with open(os.path.join(source_dir, *filename), 'w') as upload_file:
+                    upload_file.write('test')
+
+            deployer = SwiftDeployer({
+                'method': 'swift',
+                'target_host': 'test',
+                'dest_container': 'container',
+                'source': source_dir,
+                'source_replacement': 'deployed',
+                'auths_file': os.path.join(tmpdir, 'os_auths.yaml'),
+            })
+            upload_objects = {
+                upload_object.object_name: (upload_object.source, upload_object.options)
+                for upload_object in deployer._iter_upload_objects(source_dir, 'deployed')
+            }
+
+        self.assertEqual(upload_objects, {
+            'deployed/top': (os.path.join(source_dir, 'top'), None),
+            'deployed/a/f1': (os.path.join(source_dir, 'a', 'f1'), None),
+            'deployed/a/b/f2': (os.path.join(source_dir, 'a', 'b', 'f2'), None),
+            'deployed/empty': (None, {'dir_marker': True}),
+        })
+
+
+if __name__ == '__main__':
+    unittest.main()
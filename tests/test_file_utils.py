@@ -0,0 +1,210 @@
+# -*- coding=utf-8 -*-
+"""These tests test the file handling functions of the buildrules.common.utils-module."""
+
+import os
+import stat
+import hashlib
+import tempfile
+import unittest
+from datetime import timedelta
+from unittest import mock
+from cryptography import x509
+from cryptography.x509.oid import NameOID
+from cryptography.hazmat.primitives import serialization
+
+from buildrules.common import utils
+from buildrules.common.utils import (clone_file, copy_file, copy_file_if_changed,
+                                     write_file_if_changed, calculate_file_checksum,
+                                     makedirs_many, generate_ssh_key,
+                                     generate_self_signed_cert)
+
+OLD_MTIME = 1000000000
+
+class TestFileUtils(unittest.TestCase):
+    """This class tests the file handling functions of the
+    buildrules.common.utils-module."""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.tmpdir = self._tmpdir.name
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def write(self, filename, contents):
+        """Writes contents to a file in the temporary directory and returns
+        the path of the file."""
+        path = os.path.join(self.tmpdir, filename)
+        with open(path, 'w') as output_file:
+            output_file.write(contents)
+        return path
+
+    @staticmethod
+    def read(path):
+        """Returns the contents of a file."""
+        with open(path, 'r') as input_file:
+            return input_file.read()
+
+    @staticmethod
+    def get_mode(path):
+        """Returns the permission bits of a file."""
+        return stat.S_IMODE(os.stat(path).st_mode)
+
+    def test_write_file_if_changed(self):
+        """This function tests that write_file_if_changed only rewrites
+        targets with different contents."""
+
+        target = os.path.join(self.tmpdir, 'target')
+        self.assertTrue(write_file_if_changed(target, 'first'))
+        self.assertEqual(self.read(target), 'first')
+
+        os.utime(target, (OLD_MTIME, OLD_MTIME))
+        self.assertFalse(write_file_if_changed(target, 'first'))
+        self.assertEqual(os.stat(target).st_mtime, OLD_MTIME)
+
+        self.assertTrue(write_file_if_changed(target, 'second'))
+        self.assertEqual(self.read(target), 'second')
+        self.assertNotEqual(os.stat(target).st_mtime, OLD_MTIME)
+
+    def test_copy_file_if_changed(self):
+        """This function tests that copy_file_if_changed only copies
+        changed files and always applies chmod."""
+
+        src = self.write('src', 'first')
+        target = os.path.join(self.tmpdir, 'target')
+
+        self.assertTrue(copy_file_if_changed(src, target, chmod=0o600))
+        self.assertEqual(self.read(target), 'first')
+        self.assertEqual(self.get_mode(target), 0o600)
+
+        os.utime(target, (OLD_MTIME, OLD_MTIME))
+        self.assertFalse(copy_file_if_changed(src, target, chmod=0o640))
+        self.assertEqual(os.stat(target).st_mtime, OLD_MTIME)
+        self.assertEqual(self.get_mode(target), 0o640)
+
+        self.write('src', 'second')
+        self.assertTrue(copy_file_if_changed(src, target, chmod=0o600))
+        self.assertEqual(self.read(target), 'second')
+        self.assertEqual(self.get_mode(target), 0o600)
+
+    @unittest.skipIf(utils.FICLONE is None, 'FICLONE requires Linux')
+    def test_copy_file_clone_fallback(self):
+        """This function tests that copy_file falls back to a normal copy
+        when the FICLONE ioctl fails."""
+
+        src = self.write('src', 'contents')
+        target = os.path.join(self.tmpdir, 'target')
+
+        with mock.patch.object(utils.fcntl, 'ioctl',
+                               side_effect=OSError('not supported')) as ioctl:
+            self.assertFalse(clone_file(src, target))
+            copy_file(src, target, chmod=0o600)
+
+        self.assertEqual(ioctl.call_count, 2)
+        self.assertEqual(self.read(target), 'contents')
+        self.assertEqual(self.get_mode(target), 0o600)
+
+    def test_makedirs_many(self):
+        """This function tests that makedirs_many creates duplicate paths
+        once with the first chmod and parents before their children."""
+
+        parent = os.path.join(self.tmpdir, 'parent')
+        child = os.path.join(parent, 'child')
+        created = []
+
+        def record_makedirs(path):
+            created.append(path)
+            os.mkdir(path)
+
+        with mock.patch.object(utils.os, 'makedirs', side_effect=record_makedirs):
+            makedirs_many([
+                (child, 0o700),
+                (parent, 0o750),
+                (parent + os.sep, 0o755),
+                (os.path.join(child, os.pardir, 'child'), 0o777),
+            ])
+
+        self.assertEqual(created, [parent, child])
+        self.assertEqual(self.get_mode(parent), 0o750)
+        self.assertEqual(self.get_mode(child), 0o700)
+
+    def test_calculate_file_checksum(self):
+        """This function tests that cached checksums are recalculated when
+        a file is modified."""
+
+        path = self.write('checksum', 'first')
+        os.utime(path, (OLD_MTIME, OLD_MTIME))
+        self.assertEqual(calculate_file_checksum(path),
+                         hashlib.sha256(b'first').hexdigest())
+
+        # Same size as before, so only the new mtime invalidates the cache
+        self.write('checksum', 'other')
+        self.assertEqual(calculate_file_checksum(path),
+                         hashlib.sha256(b'other').hexdigest())
+
+        self.write('checksum', 'second')
+        self.assertEqual(calculate_file_checksum(path),
+                         hashlib.sha256(b'second').hexdigest())
+
+    def test_calculate_file_checksum_large_file(self):
+        """This function tests checksums of files that are memory-mapped."""
+
+        contents = os.urandom(utils.CHECKSUM_MMAP_THRESHOLD + 1)
+        path = os.path.join(self.tmpdir, 'large')
+        with open(path, 'wb') as output_file:
+            output_file.write(contents)
+        self.assertEqual(calculate_file_checksum(path),
+                         hashlib.sha256(contents).hexdigest())
+
+    def test_generate_ssh_key(self):
+        """This function tests that generate_ssh_key writes a private key
+        only readable by the owner and the matching public key."""
+
+        private_key_path = os.path.join(self.tmpdir, 'id_rsa')
+        generate_ssh_key(private_key_path, key_size=2048)
+
+        self.assertEqual(self.get_mode(private_key_path), 0o600)
+        with open(private_key_path, 'rb') as private_key_file:
+            private_key = serialization.load_ssh_private_key(
+                private_key_file.read(), password=None)
+        with open(private_key_path + '.pub', 'rb') as public_key_file:
+            public_key = public_key_file.read()
+
+        self.assertEqual(
+            public_key.strip(),
+            private_key.public_key().public_bytes(
+                encoding=serialization.Encoding.OpenSSH,
+                format=serialization.PublicFormat.OpenSSH))
+
+    def test_generate_self_signed_cert(self):
+        """This function tests that generate_self_signed_cert writes a
+        private key only readable by the owner and a matching certificate
+        with the requested common name and validity."""
+
+        key_path = os.path.join(self.tmpdir, 'buildbot.key')
+        cert_path = os.path.join(self.tmpdir, 'buildbot.crt')
+        generate_self_signed_cert(key_path, cert_path, 'ci.example.org', days=30)
+
+        self.assertEqual(self.get_mode(key_path), 0o600)
+        with open(key_path, 'rb') as key_file:
+            key = serialization.load_pem_private_key(key_file.read(), password=None)
+        with open(cert_path, 'rb') as cert_file:
+            cert = x509.load_pem_x509_certificate(cert_file.read())
+
+        self.assertEqual(
+            [attribute.value for attribute
+             in cert.subject.get_attributes_for_oid(NameOID.COMMON_NAME)],
+            ['ci.example.org'])
+        self.assertEqual(cert.not_valid_after_utc - cert.not_valid_before_utc,
+                         timedelta(days=30))
+        self.assertEqual(
+            cert.public_key().public_bytes(
+                encoding=serialization.Encoding.PEM,
+                format=serialization.PublicFormat.SubjectPublicKeyInfo),
+            key.public_key().public_bytes(
+                encoding=serialization.Encoding.PEM,
+                format=serialization.PublicFormat.SubjectPublicKeyInfo))
+
+
+if __name__ == '__main__':
+    unittest.main()
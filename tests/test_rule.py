@@ -6,7 +6,8 @@ import logging
 from testfixtures import log_capture
 from subprocess import CalledProcessError
 
-from buildrules.common.rule import PythonRule, SubprocessRule, RuleError, LoggingRule
+from buildrules.common.rule import (PythonRule, SubprocessRule, RuleError, LoggingRule,
+                                    ParallelRule)
 
 from .common import ignore_deprecationwarning, example_function
 
@@ -160,6 +161,35 @@ class TestRule(unittest.TestCase):
                 stdout_writer=logging.info,
                 stderr_writer=logging.warning)()
 
+    def test_subprocess_rule_large_output(self):
+        """Both output streams are read completely even when they exceed
+        the pipe buffers."""
+        stdout_lines = []
+        stderr_lines = []
+        return_code = SubprocessRule(
+            ['seq 1 100000; seq 1 50000 >&2'],
+            shell=True,
+            stdout_writer=stdout_lines.append,
+            stderr_writer=stderr_lines.append)()
+        self.assertEqual(return_code, 0)
+        self.assertEqual(stdout_lines, [str(i) for i in range(1, 100001)])
+        self.assertEqual(stderr_lines, [str(i) for i in range(1, 50001)])
+
+    def test_subprocess_rule_writer_error(self):
+        """An error raised by a writer is reraised after the subprocess has
+        finished instead of leaving the subprocess blocked on a full pipe."""
+        def failing_writer(line):
+            raise ValueError(line)
+
+        with self.assertRaises(RuleError) as context:
+            SubprocessRule(
+                ['seq 1 100000'],
+                shell=True,
+                stdout_writer=failing_writer,
+                stderr_writer=logging.warning)()
+        self.assertIsInstance(context.exception.__cause__, ValueError)
+        self.assertEqual(str(context.exception.__cause__), '1')
+
 
     @ignore_deprecationwarning
     @log_capture()
@@ -207,5 +237,31 @@ class TestRule(unittest.TestCase):
             )
         )
 
+    @ignore_deprecationwarning
+    @log_capture(level=logging.WARNING)
+    def test_parallel_rule(self, capture):
+        """This function tests behaviour of the class buildrules.common.rule.ParallelRule."""
+        rules = [
+            PythonRule(example_function, [val1], {'val2': val1})
+            for val1 in range(10)
+        ]
+        self.assertEqual(ParallelRule(rules)(), [2*val1 for val1 in range(10)])
+        self.assertEqual(ParallelRule(rules, max_workers=2)(dry_run=True), [False]*10)
+        self.assertEqual(ParallelRule([])(), [])
+
+        with self.assertRaises(RuleError):
+            ParallelRule(rules + [SubprocessRule(['false'])])()
+
+    def test_rule_slots(self):
+        """This function tests that rules do not carry an instance __dict__."""
+        rules = [
+            PythonRule(example_function, [1]),
+            SubprocessRule(['true']),
+            ParallelRule([]),
+            LoggingRule('message'),
+        ]
+        for rule in rules:
+            self.assertFalse(hasattr(rule, '__dict__'))
+
 if __name__ == '__main__':
     unittest.main()